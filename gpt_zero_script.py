@@ -1,11 +1,29 @@
 #!/usr/bin/env python3
+import asyncio
+import os
 import time
-import requests
-from gpiozero import Button
+import traceback
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import orjson
+from gpiozero import Button, Device
+import PIL
 from PIL import Image, ImageDraw, ImageFont
 
-# Waveshare e-Paper driver
-from waveshare_epd import epd2in7_V2
+# lgpio gets edge events from the kernel instead of polling in a Python
+# thread; set GPIOZERO_PIN_FACTORY (e.g. "pigpio") to choose another
+if not os.environ.get("GPIOZERO_PIN_FACTORY"):
+    try:
+        from gpiozero.pins.lgpio import LGPIOFactory
+        Device.pin_factory = LGPIOFactory()
+    except Exception as e:
+        print("lgpio pin factory unavailable, using gpiozero default:", e)
+
+# Waveshare e-Paper driver. Imported after the pin factory is chosen:
+# epdconfig creates gpiozero devices for the panel's pins on import
+from waveshare_epd import epd2in7_V2, epdconfig  # noqa: E402
 
 # ---------- CONFIG ----------
 token = input("what is the token: ")
@@ -22,17 +40,37 @@ BTN2_PIN = 6    # example: KEY1
 BTN3_PIN = 13   # example: KEY2
 BTN4_PIN = 19   # example: KEY3 (if present) or an external button
 
+# Presses of the same button closer together than this are dropped (seconds)
+BUTTON_DEBOUNCE = 0.3
+
+# Brighter/Dimmer presses are summed and sent once the buttons have been
+# idle this long (seconds); keep it above BUTTON_DEBOUNCE
+BRIGHTNESS_SETTLE = 0.6
+
 # Color temperature presets (Kelvin)
 WARM_K = 2700
 NEUTRAL_K = 4000
 COOL_K = 6000
 
-# How often to refresh from HA (seconds)
-REFRESH_INTERVAL = 15
+# HA pushes state changes over its WebSocket API; wait this long before
+# reconnecting after the connection drops (seconds)
+WS_RETRY_DELAY = 10
+
+# SPI clock for the e-Paper (the Waveshare driver defaults to 4 MHz)
+SPI_SPEED_HZ = 32_000_000
+
+# Only the top strip changes between frames; it is partial-refreshed and a
+# full refresh is done every FULL_REFRESH_EVERY frames to clear ghosting
+DYNAMIC_HEIGHT = 96
+FULL_REFRESH_EVERY = 10
 
 # Font path
 FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
 
+# Where the pre-rendered static panel template is cached between boots
+# (not /tmp, which is often tmpfs and emptied on reboot)
+TEMPLATE_CACHE_DIR = os.path.expanduser("~/.cache/basement_lights")
+
 # ----------------------------
 
 HEADERS = {
@@ -40,30 +78,81 @@ HEADERS = {
     "Content-Type": "application/json",
 }
 
-def ha_get_state(entity_id):
+# aiohttp session (pooled keep-alive connections to HA), created in main()
+SESSION = None
+# Event loop the GPIO callbacks hand their work to, set in main()
+LOOP = None
+# e-Paper calls block for 1-2s; run them off the loop, one at a time
+EPD_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+# Background tasks/futures in flight, held so they aren't garbage collected
+_tasks = set()
+
+def log_task_error(fut):
+    """Done-callback printing the traceback of a background task that failed."""
+    if not fut.cancelled() and fut.exception() is not None:
+        exc = fut.exception()
+        traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+def track(fut):
+    _tasks.add(fut)
+    fut.add_done_callback(_tasks.discard)
+    fut.add_done_callback(log_task_error)
+    return fut
+
+def spawn(coro):
+    """Run coro as a task on the running loop, tracked and logged."""
+    return track(asyncio.get_running_loop().create_task(coro))
+
+async def ha_get_state(entity_id):
     try:
-        r = requests.get(f"{HA_URL}/api/states/{entity_id}",
-                         headers=HEADERS, timeout=5)
-        r.raise_for_status()
-        return r.json()
+        async with SESSION.get(f"{HA_URL}/api/states/{entity_id}") as r:
+            r.raise_for_status()
+            return orjson.loads(await r.read())
     except Exception as e:
         print("Error getting state for", entity_id, ":", e)
         return None
 
-def ha_call_service(domain, service, data):
+async def ha_call_service(domain, service, data):
     try:
-        r = requests.post(f"{HA_URL}/api/services/{domain}/{service}",
-                          headers=HEADERS, json=data, timeout=5)
-        if r.status_code != 200:
-            print("Service error:", r.status_code, r.text)
+        async with SESSION.post(f"{HA_URL}/api/services/{domain}/{service}",
+                                json=data) as r:
+            if r.status != 200:
+                print("Service error:", r.status, await r.text())
+            return r.status == 200
     except Exception as e:
         print("Error calling service", domain, service, ":", e)
+        return False
+
+async def ha_get_all_states():
+    """Fetch every entity state in one request, keyed by entity_id."""
+    try:
+        async with SESSION.get(f"{HA_URL}/api/states") as r:
+            r.raise_for_status()
+            # Raw bytes straight to orjson, skipping aiohttp's str decode
+            return {s["entity_id"]: s for s in orjson.loads(await r.read())}
+    except Exception as e:
+        print("Error getting states:", e)
+        return {}
+
+async def entity_state(states, entity_id):
+    # No bulk snapshot given (button handlers): fetch just this entity
+    if states is None:
+        return await ha_get_state(entity_id)
+    return states.get(entity_id)
+
+CT_PRESETS = (WARM_K, NEUTRAL_K, COOL_K)
+
+# Mired values for the presets, both ways, so button presses skip the division
+K_TO_MIRED = {k: 1_000_000 // k for k in CT_PRESETS}
+MIRED_TO_K = {m: k for k, m in K_TO_MIRED.items()}
 
-def get_light_info():
-    data = ha_get_state(LIGHT_ENTITY)
+UNKNOWN_LIGHT = {"state": "unknown", "brightness": None,
+                 "brightness_pct": None, "kelvin": None, "mired": None}
+
+async def get_light_info(states=None):
+    data = await entity_state(states, LIGHT_ENTITY)
     if not data:
-        return {"state": "unknown", "brightness": None,
-                "brightness_pct": None, "kelvin": None, "mired": None}
+        return dict(UNKNOWN_LIGHT)
 
     state = data["state"]
     attrs = data.get("attributes", {})
@@ -77,7 +166,7 @@ def get_light_info():
 
     kelvin = None
     if color_temp:
-        kelvin = int(1_000_000 / color_temp)
+        kelvin = MIRED_TO_K.get(color_temp) or int(1_000_000 / color_temp)
 
     return {
         "state": state,
@@ -87,8 +176,8 @@ def get_light_info():
         "kelvin": kelvin,
     }
 
-def get_weather_info():
-    data = ha_get_state(WEATHER_ENTITY)
+async def get_weather_info(states=None):
+    data = await entity_state(states, WEATHER_ENTITY)
     if not data:
         return None
     attrs = data.get("attributes", {})
@@ -98,40 +187,117 @@ def get_weather_info():
         return None
     return {"temp": temp, "condition": cond}
 
-def get_adaptive_on():
-    data = ha_get_state(ADAPTIVE_SWITCH)
+async def get_adaptive_on(states=None):
+    data = await entity_state(states, ADAPTIVE_SWITCH)
     if not data:
         return False
     return data.get("state") == "on"
 
-def set_light(brightness=None, kelvin=None, toggle=False):
+async def set_light(brightness=None, kelvin=None, toggle=False):
     if toggle:
-        ha_call_service("light", "toggle", {"entity_id": LIGHT_ENTITY})
+        await ha_call_service("light", "toggle", {"entity_id": LIGHT_ENTITY})
+        return
+
+    if brightness is not None:
+        brightness = max(1, min(255, brightness))
+    # Skip the round-trip if the light is already there (e.g. Brighter
+    # pressed at full brightness)
+    cur = state_cache.get("light") or {}
+    if (cur.get("state") == "on"
+            and brightness in (None, cur.get("brightness"))
+            and kelvin in (None, cur.get("kelvin"))):
         return
 
     payload = {"entity_id": LIGHT_ENTITY}
+    # Optimistic copy of the light's state so the panel can be redrawn
+    # without waiting for HA; HA's next state push reconciles it
+    prev = state_cache.get("light")
+    light = dict(prev or UNKNOWN_LIGHT)
+    light["state"] = "on"
     if brightness is not None:
-        b = max(1, min(255, brightness))
-        payload["brightness"] = b
+        payload["brightness"] = brightness
+        light["brightness"] = brightness
+        light["brightness_pct"] = int(brightness / 255 * 100)
 
     if kelvin is not None:
-        mired = int(1_000_000 / kelvin)
+        mired = K_TO_MIRED.get(kelvin) or int(1_000_000 / kelvin)
         payload["color_temp"] = mired
-
-    ha_call_service("light", "turn_on", payload)
-
-def cycle_color_temp(light_info):
+        light["mired"] = mired
+        light["kelvin"] = kelvin
+
+    # Stored before the call so a push HA sends while it is in flight wins
+    state_cache["light"] = light
+    if not await ha_call_service("light", "turn_on", payload):
+        # Not applied: undo, unless HA has pushed fresher state meanwhile
+        if state_cache.get("light") is light:
+            if prev is None:
+                state_cache.pop("light", None)
+            else:
+                state_cache["light"] = prev
+
+async def cycle_color_temp(light_info):
     current_k = light_info.get("kelvin") or NEUTRAL_K
-    presets = [WARM_K, NEUTRAL_K, COOL_K]
-    diffs = [abs(current_k - p) for p in presets]
-    idx = diffs.index(min(diffs))
-    next_k = presets[(idx + 1) % len(presets)]
-    set_light(brightness=light_info.get("brightness"), kelvin=next_k)
+    # Nearest preset = which side of the midpoints current_k falls on;
+    # a tie goes to the warmer preset, as the old min()/index() scan did
+    if current_k <= (WARM_K + NEUTRAL_K) // 2:
+        idx = 0
+    elif current_k <= (NEUTRAL_K + COOL_K) // 2:
+        idx = 1
+    else:
+        idx = 2
+    next_k = CT_PRESETS[(idx + 1) % 3]
+    await set_light(brightness=light_info.get("brightness"), kelvin=next_k)
 
 # ---------- e-Paper init ----------
 
+def tune_spi():
+    """Raise the SPI clock; epd.init() resets it, so call after each init()."""
+    spi = getattr(epdconfig.implementation, "SPI", None)
+    if spi is None:     # not the Raspberry Pi spidev backend
+        return
+    spi.max_speed_hz = SPI_SPEED_HZ
+
+def batch_data_writes():
+    """Send runs of single send_data bytes as one send_data2 (writebytes2).
+
+    Full frames already go out in bulk via send_data2, but display_Partial
+    writes its window a byte at a time, each toggling DC/CS in its own
+    spidev call. Bytes are held until the next command, bulk write or busy
+    wait, so they still reach the panel in order and with DC high.
+    """
+    pending = bytearray()
+    send_command, send_data2, read_busy = epd.send_command, epd.send_data2, epd.ReadBusy
+
+    def flush():
+        if pending:
+            data = bytes(pending)
+            pending.clear()
+            send_data2(data)
+
+    def send_data(data):
+        pending.append(data)
+
+    def send_command_batched(command):
+        flush()
+        send_command(command)
+
+    def send_data2_batched(data):
+        flush()
+        send_data2(data)
+
+    def read_busy_batched():
+        flush()
+        read_busy()
+
+    epd.send_data = send_data
+    epd.send_command = send_command_batched
+    epd.send_data2 = send_data2_batched
+    epd.ReadBusy = read_busy_batched
+
 epd = epd2in7_V2.EPD()
 epd.init()
+tune_spi()
+batch_data_writes()
 epd.Clear()
 
 # Note: for Waveshare 2.7" HAT, epd.width/height are usually 176x264
@@ -139,17 +305,101 @@ epd.Clear()
 WIDTH = epd.height   # 264
 HEIGHT = epd.width   # 176
 
+def reset_ram_window():
+    """Point the controller's RAM window back at the whole panel.
+
+    display_Partial leaves the window on the region it updated, and
+    display_Base writes a full frame without resetting it.
+    """
+    epd.send_command(0x44)              # RAM X start/end (bytes)
+    epd.send_data(0)
+    epd.send_data((epd.width - 1) // 8)
+    epd.send_command(0x45)              # RAM Y start/end
+    epd.send_data(0)
+    epd.send_data(0)
+    epd.send_data((epd.height - 1) & 0xFF)
+    epd.send_data(((epd.height - 1) >> 8) & 0xFF)
+    epd.send_command(0x4E)              # RAM X counter
+    epd.send_data(0)
+    epd.send_command(0x4F)              # RAM Y counter
+    epd.send_data(0)
+    epd.send_data(0)
+
 font_large = ImageFont.truetype(FONT_PATH, 18)
 font_med   = ImageFont.truetype(FONT_PATH, 14)
 font_small = ImageFont.truetype(FONT_PATH, 12)
 
+# Button legend (y, text), drawn below DYNAMIC_HEIGHT
+LEGEND = (
+    (102, "BTN1: Natural ON/OFF"),
+    (118, "BTN2: Brighter"),
+    (134, "BTN3: Dimmer"),
+    (150, "BTN4: Cycle CT (Nat)"),
+)
+
+def build_template():
+    """Blank frame with the static legend, rendered once and cached on disk.
+
+    The cache file name hashes the legend, font file and size, panel size
+    and Pillow version, so changing any of them never loads a stale template.
+    """
+    key = zlib.crc32(repr((LEGEND, FONT_PATH, font_small.size, WIDTH, HEIGHT,
+                           PIL.__version__)).encode())
+    path = os.path.join(TEMPLATE_CACHE_DIR, f"template_{key:08x}.bin")
+    try:
+        with open(path, "rb") as f:
+            return Image.frombytes('1', (WIDTH, HEIGHT), f.read())
+    except (OSError, ValueError):
+        pass
+
+    template = Image.new('1', (WIDTH, HEIGHT), 255)  # 255=white
+    draw = ImageDraw.Draw(template)
+    for y, text in LEGEND:
+        draw.text((4, y), text, font=font_small, fill=0)
+    try:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(template.tobytes())
+    except OSError as e:
+        print("Could not cache panel template:", e)
+    return template
+
+# Every frame starts as a copy of this instead of a fresh blank image
+_TEMPLATE = build_template()
+
+WEATHER_LABEL = Image.new('1', font_med.getbbox("Weather:")[2:], 255)
+ImageDraw.Draw(WEATHER_LABEL).text((0, 0), "Weather:", font=font_med, fill=0)
+
+def fast_getbuffer(image):
+    """Pack a landscape 1-bit image into the panel's portrait byte layout.
+
+    Same bytes as epd.getbuffer (rotated 90 degrees, 1 bit per pixel, MSB
+    first, 1=white) but packed by PIL in C instead of pixel by pixel.
+    """
+    return bytearray(image.rotate(90, expand=True).tobytes())
+
+# (minute number, clock text) for the minute last formatted
+_last_min = (None, "")
+
+def clock_str():
+    """Clock line text; strftime only runs when the minute rolls over."""
+    global _last_min
+    m = int(time.time() // 60)
+    if m != _last_min[0]:
+        _last_min = (m, time.strftime("%a %b %d  %H:%M"))
+    return _last_min[1]
+
+# Partial refreshes since the last full one (None: nothing drawn yet)
+_partials_since_full = None
+
 def draw_panel(light_info, weather_info, adaptive_on):
-    # Monochrome image (1-bit), all white to start
-    image = Image.new('1', (WIDTH, HEIGHT), 255)  # 255=white
+    global _partials_since_full
+    # Monochrome image (1-bit), white with the static legend already on it
+    image = _TEMPLATE.copy()
     draw = ImageDraw.Draw(image)
 
     # Time
-    now_str = time.strftime("%a %b %d  %H:%M")
+    now_str = clock_str()
     draw.text((4, 2), now_str, font=font_large, fill=0)
 
     # Light info
@@ -170,18 +420,21 @@ def draw_panel(light_info, weather_info, adaptive_on):
 
     # Weather
     if weather_info:
-        draw.text((4, 64), "Weather:", font=font_med, fill=0)
+        image.paste(WEATHER_LABEL, (4, 64))
         w_line = f"{weather_info['temp']}° {weather_info['condition']}"
         draw.text((4, 80), w_line, font=font_med, fill=0)
 
-    # Button legend
-    draw.text((4, 102), "BTN1: Natural ON/OFF", font=font_small, fill=0)
-    draw.text((4, 118), "BTN2: Brighter",       font=font_small, fill=0)
-    draw.text((4, 134), "BTN3: Dimmer",         font=font_small, fill=0)
-    draw.text((4, 150), "BTN4: Cycle CT (Nat)", font=font_small, fill=0)
-
-    # IMPORTANT: single-buffer display for epd2in7_V2
-    epd.display(epd.getbuffer(image))
+    if _partials_since_full is None or _partials_since_full >= FULL_REFRESH_EVERY:
+        # display_Base also loads the "previous image" RAM that partial
+        # updates diff against
+        reset_ram_window()
+        epd.display_Base(fast_getbuffer(image))
+        _partials_since_full = 0
+    else:
+        # The landscape top strip is the leftmost DYNAMIC_HEIGHT columns of
+        # the portrait RAM; the driver picks that window out of the frame
+        epd.display_Partial(fast_getbuffer(image), 0, 0, DYNAMIC_HEIGHT, epd.height)
+        _partials_since_full += 1
 
 # ---------- Buttons ----------
 
@@ -191,79 +444,235 @@ btn3 = Button(BTN3_PIN, pull_up=True, bounce_time=0.1)
 btn4 = Button(BTN4_PIN, pull_up=True, bounce_time=0.1)
 
 # We'll refresh after a button press as well as on a timer
-state_cache = {
-    "light": get_light_info(),
-    "weather": get_weather_info(),
-    "adaptive": get_adaptive_on(),
-}
-
-def refresh_display():
-    state_cache["light"] = get_light_info()
-    state_cache["weather"] = get_weather_info()
-    state_cache["adaptive"] = get_adaptive_on()
-    draw_panel(state_cache["light"], state_cache["weather"], state_cache["adaptive"])
+state_cache = {}
+
+# What the panel currently shows; skip the slow e-paper push if unchanged
+_last_panel_key = None
+
+async def update_state_cache(states):
+    state_cache["light"], state_cache["weather"], state_cache["adaptive"] = \
+        await asyncio.gather(get_light_info(states),
+                             get_weather_info(states),
+                             get_adaptive_on(states))
+
+async def do_refresh(skip_fetch=False):
+    """Redraw the panel; skip_fetch draws from state_cache without asking HA."""
+    global _last_panel_key
+    if not skip_fetch or not state_cache:
+        # One /api/states round-trip instead of three per-entity GETs
+        await update_state_cache(await ha_get_all_states())
+
+    light_info = state_cache["light"]
+    weather_info = state_cache["weather"]
+    key = (light_info["state"], light_info["brightness_pct"], light_info["kelvin"],
+           weather_info and (weather_info["temp"], weather_info["condition"]),
+           state_cache["adaptive"], clock_str())
+    if key == _last_panel_key:
+        return
 
-def on_btn1():
+    await asyncio.get_running_loop().run_in_executor(
+        EPD_EXECUTOR, draw_panel,
+        state_cache["light"], state_cache["weather"], state_cache["adaptive"])
+    # Only once the push succeeded, so a failed one is retried next time
+    _last_panel_key = key
+
+# Set while a redraw is pending; requests made meanwhile merge into it.
+# Created in main() so it belongs to asyncio.run()'s loop (Python <= 3.9
+# binds an Event to whatever loop is current when it is constructed)
+_redraw_wanted = None
+_redraw_fetch = False
+
+def refresh_display(skip_fetch=False):
+    """Queue a redraw for redraw_worker and return immediately.
+
+    The merged redraw fetches from HA if any of the merged requests did.
+    """
+    global _redraw_fetch
+    _redraw_fetch = _redraw_fetch or not skip_fetch
+    _redraw_wanted.set()
+
+async def redraw_worker():
+    global _redraw_fetch
+    while True:
+        try:
+            await _redraw_wanted.wait()
+            _redraw_wanted.clear()
+            fetch, _redraw_fetch = _redraw_fetch, False
+            await do_refresh(skip_fetch=not fetch)
+        except Exception as e:
+            print("Error refreshing display:", e)
+
+# Entity states as pushed by HA's subscribe_entities, in /api/states shape
+_ha_states = {}
+
+def apply_entity_diff(event):
+    """Merge a subscribe_entities event ("a"dded, "c"hanged, "r"emoved)."""
+    for entity_id, st in event.get("a", {}).items():
+        _ha_states[entity_id] = {"entity_id": entity_id, "state": st.get("s"),
+                                 "attributes": dict(st.get("a", {}))}
+    for entity_id, diff in event.get("c", {}).items():
+        cur = _ha_states.get(entity_id)
+        if cur is None:
+            continue
+        added = diff.get("+", {})
+        if "s" in added:
+            cur["state"] = added["s"]
+        cur["attributes"].update(added.get("a", {}))
+        for attr in diff.get("-", {}).get("a", []):
+            cur["attributes"].pop(attr, None)
+    for entity_id in event.get("r", []):
+        _ha_states.pop(entity_id, None)
+
+async def ha_subscribe():
+    """Keep state_cache in sync with HA's WebSocket pushes, reconnecting on errors."""
+    ws_url = HA_URL.replace("http", "ws", 1) + "/api/websocket"
+    # Own session: the REST session's 5s total timeout must not apply to a
+    # connection that stays open for days
+    async with aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=5)) as ws_session:
+        while True:
+            try:
+                async with ws_session.ws_connect(ws_url, heartbeat=30) as ws:
+                    await ws.receive_json(loads=orjson.loads)     # auth_required
+                    await ws.send_json({"type": "auth", "access_token": HA_TOKEN})
+                    msg = await ws.receive_json(loads=orjson.loads)
+                    if msg.get("type") != "auth_ok":
+                        raise RuntimeError(f"auth failed: {msg.get('message')}")
+                    await ws.send_json({
+                        "id": 1,
+                        "type": "subscribe_entities",
+                        "entity_ids": [LIGHT_ENTITY, WEATHER_ENTITY, ADAPTIVE_SWITCH],
+                    })
+                    async for msg in ws:
+                        if msg.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        data = msg.json(loads=orjson.loads)
+                        if data.get("type") == "event":
+                            apply_entity_diff(data["event"])
+                            await update_state_cache(_ha_states)
+                            refresh_display(skip_fetch=True)
+                        elif data.get("type") == "result" and not data.get("success"):
+                            print("HA subscribe error:", data.get("error"))
+                print("HA websocket closed")
+            except Exception as e:
+                print("HA websocket error:", e)
+            await asyncio.sleep(WS_RETRY_DELAY)
+
+# Handlers build on state_cache, which holds our optimistic updates and is
+# kept fresh by HA's pushes; a GET could return a state HA hasn't updated yet
+async def current_light_info():
+    return state_cache.get("light") or await get_light_info()
+
+async def current_adaptive_on():
+    if "adaptive" in state_cache:
+        return state_cache["adaptive"]
+    return await get_adaptive_on()
+
+async def on_btn1():
     """Toggle Natural/Adaptive mode."""
-    current = get_adaptive_on()
+    current = await current_adaptive_on()
     if current:
         print("BTN1: Natural OFF")
-        ha_call_service("switch", "turn_off", {"entity_id": ADAPTIVE_SWITCH})
+        await ha_call_service("switch", "turn_off", {"entity_id": ADAPTIVE_SWITCH})
     else:
         print("BTN1: Natural ON")
-        ha_call_service("switch", "turn_on", {"entity_id": ADAPTIVE_SWITCH})
-    refresh_display()
-
-def on_btn2():
+        await ha_call_service("switch", "turn_on", {"entity_id": ADAPTIVE_SWITCH})
+    state_cache["adaptive"] = not current
+    refresh_display(skip_fetch=True)
+
+# Brightness change not yet sent to HA, and the timer that will send it
+_pending_delta = 0
+_flush_handle = None
+# Serializes flushes so one never builds on a brightness another is still
+# sending; created in main() for the same reason as _redraw_wanted
+_flush_lock = None
+
+def queue_brightness(delta):
+    """Add to the pending brightness change and restart the settle timer."""
+    global _pending_delta, _flush_handle
+    _pending_delta += delta
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+    _flush_handle = asyncio.get_running_loop().call_later(
+        BRIGHTNESS_SETTLE, lambda: spawn(flush_brightness()))
+
+async def flush_brightness():
+    """Apply all queued presses with one HA call and one redraw."""
+    global _pending_delta
+    async with _flush_lock:
+        delta, _pending_delta = _pending_delta, 0
+        info = await current_light_info()
+        bri = info.get("brightness") or 128
+        await set_light(brightness=bri + delta)
+    refresh_display(skip_fetch=True)
+
+async def on_btn2():
     print("BTN2: Brighter")
-    info = get_light_info()
-    bri = info.get("brightness") or 128
-    set_light(brightness=bri + 25)
-    refresh_display()
+    queue_brightness(25)
 
-def on_btn3():
+async def on_btn3():
     print("BTN3: Dimmer")
-    info = get_light_info()
-    bri = info.get("brightness") or 128
-    set_light(brightness=bri - 25)
-    refresh_display()
+    queue_brightness(-25)
 
-def on_btn4():
+async def on_btn4():
     """Cycle color temp only when Natural mode is ON."""
-    if not get_adaptive_on():
+    if not await current_adaptive_on():
         print("BTN4: Natural is OFF, ignoring")
         return
     print("BTN4: Cycle color temp")
-    info = get_light_info()
-    cycle_color_temp(info)
-    refresh_display()
-
-btn1.when_pressed = on_btn1
-btn2.when_pressed = on_btn2
-btn3.when_pressed = on_btn3
-btn4.when_pressed = on_btn4
-
-def main():
-    
+    info = await current_light_info()
+    await cycle_color_temp(info)
+    refresh_display(skip_fetch=True)
+
+# monotonic time of the last accepted press, per button
+_last_press = {}
+
+def run_handler(name, handler):
+    # gpiozero calls us from its own thread; drop any bounce its filter let
+    # through, then hand the work to the event loop
+    t = time.monotonic()
+    if t - _last_press.get(name, 0) < BUTTON_DEBOUNCE:
+        return
+    _last_press[name] = t
+    if LOOP is not None:
+        track(asyncio.run_coroutine_threadsafe(handler(), LOOP))
+
+btn1.when_pressed = lambda: run_handler("b1", on_btn1)
+btn2.when_pressed = lambda: run_handler("b2", on_btn2)
+btn3.when_pressed = lambda: run_handler("b3", on_btn3)
+btn4.when_pressed = lambda: run_handler("b4", on_btn4)
+
+async def main():
+    global SESSION, LOOP, _redraw_wanted, _flush_lock
+    LOOP = asyncio.get_running_loop()
+    _redraw_wanted = asyncio.Event()
+    _flush_lock = asyncio.Lock()
+    SESSION = aiohttp.ClientSession(
+        headers=HEADERS,
+        timeout=aiohttp.ClientTimeout(total=5),
+        connector=aiohttp.TCPConnector(limit=4),
+    )
     try:
         print("Booting!")
+        spawn(redraw_worker())
+        spawn(ha_subscribe())
         refresh_display()
-        last = time.time()
         while True:
-            # periodic refresh even without button presses
-            now = time.time()
-            if now - last > REFRESH_INTERVAL:
-                refresh_display()
-                last = now
-            time.sleep(0.5)
+            # HA pushes state changes; we only need to tick the clock
+            await asyncio.sleep(60 - time.time() % 60)
+            refresh_display(skip_fetch=True)
+    finally:
+        await SESSION.close()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
     except KeyboardInterrupt:
         print("Exiting, putting display to sleep")
+        # Let an in-flight frame finish so its SPI traffic can't interleave
+        EPD_EXECUTOR.shutdown(wait=True)
         epd.sleep()
 
-if __name__ == "__main__":
-    main()
-
-
 
 
 